@@ -1,6 +1,9 @@
 # analyse_insight.py
 # ---------- INSIGHT GENERATION BLOCK ----------
 
+import orjson
+from response_cache import response_cache_key, load_cached_response, store_cached_response
+
 
 def build_insight_prompt(deck_slide_text: str) -> str:
     """
@@ -45,25 +48,59 @@ JSON Output:
     return prompt
 
 
-def call_chatgpt_insight(prompt: str, api_key: str, model="gpt-3.5-turbo") -> dict:
-    from openai import OpenAI
-    import json
-    client = OpenAI(api_key=api_key)
+def parse_insight_json(content: str) -> dict:
+    try:
+        return orjson.loads(content)
+    except orjson.JSONDecodeError:
+        start = content.find("{")
+        end = content.rfind("}") + 1
+        if start != -1 and end != -1:
+            return orjson.loads(content[start:end])
+        raise ValueError(f"Could not parse JSON from insight response:\n{content}")
+
+
+def call_chatgpt_insight(prompt: str, api_key: str, model="gpt-3.5-turbo", client=None) -> dict:
+    cache_key = response_cache_key(model, prompt)
+    cached = load_cached_response(cache_key)
+    if cached is not None:
+        return cached
+
+    if client is None:
+        from openai import OpenAI
+        client = OpenAI(api_key=api_key)
 
     response = client.chat.completions.create(
         model=model,
         messages=[{"role": "user", "content": prompt}],
         temperature=0.2,
         max_tokens=800,
+        response_format={"type": "json_object"},
     )
 
     content = response.choices[0].message.content.strip()
+    result = parse_insight_json(content)
+    store_cached_response(cache_key, result)
+    return result
 
-    try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        start = content.find("{")
-        end = content.rfind("}") + 1
-        if start != -1 and end != -1:
-            return json.loads(content[start:end])
-        raise ValueError(f"Could not parse JSON from insight response:\n{content}")
+
+async def call_chatgpt_insight_async(prompt: str, client, model="gpt-3.5-turbo") -> dict:
+    """
+    Async version of call_chatgpt_insight, using a shared AsyncOpenAI client.
+    """
+    cache_key = response_cache_key(model, prompt)
+    cached = load_cached_response(cache_key)
+    if cached is not None:
+        return cached
+
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.2,
+        max_tokens=800,
+        response_format={"type": "json_object"},
+    )
+
+    content = response.choices[0].message.content.strip()
+    result = parse_insight_json(content)
+    store_cached_response(cache_key, result)
+    return result
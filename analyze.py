@@ -1,11 +1,14 @@
 # scripts/analyze.py
 
 import os
+import re
 import json
-from openai import OpenAI
+import orjson
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
-from extract_text import extract_text_from_pdf
-from analyse_insight import build_insight_prompt, call_chatgpt_insight
+from extract_text import extract_text_from_pdf, split_slide_text, format_slide
+from response_cache import response_cache_key, load_cached_response, store_cached_response
+from analyse_insight import build_insight_prompt, call_chatgpt_insight, call_chatgpt_insight_async
 from analyze_scoring import build_structured_scoring_prompt, call_structured_pitch_scorer
 
 
@@ -50,7 +53,10 @@ EXAMPLE_1_JSON = {
   "Funding Stage": None,
   "Current Revenue": "$3.1k",
   "Market": { "TAM": "$95B", "SAM": "$2.2B", "SOM": "$193B" },
-  "Amount Raised": "$0"
+  "Amount Raised": "$0",
+  "TeamPage": 3,
+  "MarketPage": 7,
+  "TractionPage": 12
 }
 
 EXAMPLE_2_TEXT = """
@@ -101,13 +107,16 @@ EXAMPLE_2_JSON = {
   "Funding Stage": "null",
   "Current Revenue": "$10.2m",
   "Market": { "TAM": "null", "SAM": "null", "SOM": "null" },
-  "Amount Raised": "$0"
+  "Amount Raised": "$0",
+  "TeamPage": 3,
+  "MarketPage": 7,
+  "TractionPage": 12
 }
 
 
 
 PROMPT_PREFIX = """
-You are an expert at extracting structured data from investor pitch decks. For each deck, I will present the slide text. Return exactly one JSON object with these ten fields:
+You are an expert at extracting structured data from investor pitch decks. For each deck, I will present the slide text. Return exactly one JSON object with these thirteen fields:
 {
   "Startup Name": string or null,  # what is the most likely startup name? likely a single name most repeated in deck used to describe the company, not a sentence or contain hashtag #
   "Founding Year": string or null, # If no explicit “Founded in YYYY” appears, Scan all content for founding-year clues, including: • timeline or roadmap dates, • traction graphs captions, • team-bio phrasing, • funding-history dates. Determine the most probable calendar year in which the company was founded. If multiple plausible years appear, choose the earliest one that has at least one direct or indirect supporting signal.
@@ -119,6 +128,9 @@ You are an expert at extracting structured data from investor pitch decks. For e
   "Current Revenue": string or null, # What is the revenue corresponding to the latest actual year in the financials, as opposed to future forecasts?
   "Market": { "TAM": string or null, "SAM": string or null, "SOM": string or null } or null,
   "Amount Raised": string or null,  # How much funds have this startup previously raised from investors since its inception? do not include the amount they want to raise in future
+  "TeamPage": integer or null,      # slide number (from the "----- Slide N -----" markers) of the Team slide
+  "MarketPage": integer or null,    # slide number of the Market slide
+  "TractionPage": integer or null,  # slide number of the Traction slide
 }
 If any field is not present, set it to null.
 
@@ -138,35 +150,141 @@ JSON answer:
 Slide texts:
 """
 
+# ---- SLIDE SELECTION (only relevant slides are sent for extraction) ----
+# The opening slides carry the name, one-liner and often the founding date.
+ALWAYS_KEEP_SLIDES = 2
+
+# Any slide mentioning one of the extracted fields is kept.
+RELEVANT_SLIDE_PATTERN = re.compile(
+    r"\b(?:team|founders?|co-?founders?|founded|ceo|cto|market|tam|sam|som|traction|revenues?|"
+    r"arr|mrr|gmv|customers|users|raised|raising|funding|investors?|pre-seed|seed|series [a-d]|"
+    r"solution|product|usp|unique)\b",
+    re.IGNORECASE,
+)
+
+def select_relevant_slides(deck_slide_text):
+    """
+    Drop slides that cannot contribute to any extracted field, keeping the original
+    "----- Slide N -----" labels so TeamPage/MarketPage/TractionPage still line up.
+    """
+    slides = split_slide_text(deck_slide_text)
+    kept = [
+        format_slide(number, text)
+        for i, (number, text) in enumerate(slides)
+        if i < ALWAYS_KEEP_SLIDES or RELEVANT_SLIDE_PATTERN.search(text)
+    ]
+    return "\n".join(kept) if kept else deck_slide_text
+
 # ----------------------------------------
 
 def build_few_shot_prompt(deck_slide_text):
     """
-    Concatenate the prompt prefix (with Examples 1 & 2) and the new deck's slide text.
+    Return the chat messages for one deck: the prompt prefix (with Examples 1 & 2)
+    as a system message, then the new deck's relevant slides as the user message.
+    The system message is byte-identical on every call, so OpenAI's automatic
+    prompt caching can reuse it across decks.
     """
-    return PROMPT_PREFIX + deck_slide_text + "\nJSON answer:"
+    return [
+        {"role": "system", "content": PROMPT_PREFIX},
+        {"role": "user", "content": select_relevant_slides(deck_slide_text) + "\nJSON answer:"},
+    ]
+
+# ChatGPT sometimes answers with CamelCase keys; map them onto the prompt's field names.
+RESULT_KEY_ALIASES = {
+    "StartupName": "Startup Name",
+    "FoundingYear": "Founding Year",
+    "FundingStage": "Funding Stage",
+    "CurrentRevenue": "Current Revenue",
+    "AmountRaised": "Amount Raised",
+}
 
-def call_chatgpt(prompt, api_key, model="gpt-3.5-turbo"):
-    client = OpenAI(api_key=api_key)
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.0,
-        max_tokens=800
-    )
+# Slide numbers of the key slides, as returned by the extraction prompt.
+KEY_SLIDE_FIELDS = ("TeamPage", "MarketPage", "TractionPage")
 
-    content = response.choices[0].message.content.strip()
+def coerce_page_number(value):
+    """
+    A slide number as a positive int, or None for null, "null" or anything non-numeric.
+    """
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        return None
+    return number if number > 0 else None
 
-    # Parse out the JSON
+def normalize_result_keys(result):
+    """
+    Rename CamelCase keys to the canonical spaced field names, in place, so
+    downstream code only ever looks up one key per field. The key slide
+    fields are coerced to int or None (the model may write "null").
+    """
+    for alias, key in RESULT_KEY_ALIASES.items():
+        if alias in result:
+            value = result.pop(alias)
+            if result.get(key) is None:
+                result[key] = value
+    for field in KEY_SLIDE_FIELDS:
+        result[field] = coerce_page_number(result.get(field))
+    return result
+
+def parse_chatgpt_json(content):
+    """
+    Parse the JSON object in a ChatGPT reply, falling back to the outermost
+    `{…}` block if the model wrapped it in extra text.
+    """
     try:
-        return json.loads(content)
-    except json.JSONDecodeError:
+        return normalize_result_keys(orjson.loads(content))
+    except orjson.JSONDecodeError:
         start = content.find("{")
         end = content.rfind("}") + 1
         if start != -1 and end != -1:
-            return json.loads(content[start:end])
+            return normalize_result_keys(orjson.loads(content[start:end]))
         raise ValueError(f"Could not parse JSON from response:\n{content}")
 
+def call_chatgpt(messages, api_key, model="gpt-3.5-turbo", client=None):
+    cache_key = response_cache_key(model, json.dumps(messages))
+    cached = load_cached_response(cache_key)
+    if cached is not None:
+        # Entries stored before the page fields were coerced may still hold "null"
+        return normalize_result_keys(cached)
+
+    client = client or OpenAI(api_key=api_key)
+    response = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.0,
+        max_tokens=800,
+        response_format={"type": "json_object"},
+    )
+
+    content = response.choices[0].message.content.strip()
+    result = parse_chatgpt_json(content)
+    store_cached_response(cache_key, result)
+    return result
+
+async def call_chatgpt_async(messages, client: AsyncOpenAI, model="gpt-3.5-turbo"):
+    """
+    Async version of call_chatgpt. Takes a shared AsyncOpenAI client so a batch
+    of decks can be extracted concurrently over one connection pool.
+    """
+    cache_key = response_cache_key(model, json.dumps(messages))
+    cached = load_cached_response(cache_key)
+    if cached is not None:
+        # Entries stored before the page fields were coerced may still hold "null"
+        return normalize_result_keys(cached)
+
+    response = await client.chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.0,
+        max_tokens=800,
+        response_format={"type": "json_object"},
+    )
+
+    content = response.choices[0].message.content.strip()
+    result = parse_chatgpt_json(content)
+    store_cached_response(cache_key, result)
+    return result
+
 
 if __name__ == "__main__":
     for fname in os.listdir(INPUT_FOLDER):
@@ -180,11 +298,11 @@ if __name__ == "__main__":
         deck_text = extract_text_from_pdf(pdf_path)
 
         # 2) Build few-shot prompt
-        prompt = build_few_shot_prompt(deck_text)
+        messages = build_few_shot_prompt(deck_text)
 
         # 3) Call ChatGPT
         try:
-            result = call_chatgpt(prompt)
+            result = call_chatgpt(messages)
         except Exception as e:
             print(f"  Error calling ChatGPT for {fname}: {e}")
             continue
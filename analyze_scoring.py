@@ -1,7 +1,9 @@
 # analyze_scoring.py
 
-import json
-from openai import OpenAI
+import re
+import orjson
+from openai import OpenAI, AsyncOpenAI
+from response_cache import response_cache_key, load_cached_response, store_cached_response
 
 # Define your rubric
 SCORING_RUBRIC = [
@@ -14,6 +16,12 @@ SCORING_RUBRIC = [
     { "name": "Ask & Use of Proceeds",          "weight": 0.05, "aliases": ["ask", "funds", "use of proceeds"] }
 ]
 
+# Matches a slide that speaks to any rubric section, so it is never cut from the prompt
+SECTION_SLIDE_PATTERN = re.compile(
+    r"\b(?:" + "|".join(re.escape(alias) for sec in SCORING_RUBRIC for alias in sec["aliases"]) + r")\b",
+    re.IGNORECASE,
+)
+
 def apply_weights(sections: list[dict]) -> int:
     """
     Given a list of {"name":…, "score":…, "comment":…}, compute the weighted total (0–100).
@@ -58,24 +66,19 @@ Return your output as **strict JSON**:
 --- END SLIDE TEXT ---
 """
 
-def call_structured_pitch_scorer(prompt: str, api_key: str, model="gpt-3.5-turbo") -> dict:
-    client = OpenAI(api_key=api_key)
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.0,
-        max_tokens=1000,
-    )
-    content = response.choices[0].message.content.strip()
-
+def parse_scoring_response(content: str) -> dict:
+    """
+    Parse and validate a scoring reply, then recompute the weighted total
+    from the section scores rather than trusting the model's arithmetic.
+    """
     # Parse JSON
     try:
-        result = json.loads(content)
-    except json.JSONDecodeError:
+        result = orjson.loads(content)
+    except orjson.JSONDecodeError:
         start = content.find("{")
         end = content.rfind("}") + 1
         if start != -1 and end != -1:
-            result = json.loads(content[start:end])
+            result = orjson.loads(content[start:end])
         else:
             raise ValueError(f"Could not parse JSON from scoring response:\n{content}")
 
@@ -97,3 +100,43 @@ def call_structured_pitch_scorer(prompt: str, api_key: str, model="gpt-3.5-turbo
         "sections": sections,
         "total_score": weighted_score
     }
+
+def call_structured_pitch_scorer(prompt: str, api_key: str, model="gpt-3.5-turbo", client=None) -> dict:
+    cache_key = response_cache_key(model, prompt)
+    cached = load_cached_response(cache_key)
+    if cached is not None:
+        return cached
+
+    client = client or OpenAI(api_key=api_key)
+    response = client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.0,
+        max_tokens=1000,
+        response_format={"type": "json_object"},
+    )
+    content = response.choices[0].message.content.strip()
+    result = parse_scoring_response(content)
+    store_cached_response(cache_key, result)
+    return result
+
+async def call_structured_pitch_scorer_async(prompt: str, client: AsyncOpenAI, model="gpt-3.5-turbo") -> dict:
+    """
+    Async version of call_structured_pitch_scorer, using a shared AsyncOpenAI client.
+    """
+    cache_key = response_cache_key(model, prompt)
+    cached = load_cached_response(cache_key)
+    if cached is not None:
+        return cached
+
+    response = await client.chat.completions.create(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0.0,
+        max_tokens=1000,
+        response_format={"type": "json_object"},
+    )
+    content = response.choices[0].message.content.strip()
+    result = parse_scoring_response(content)
+    store_cached_response(cache_key, result)
+    return result
@@ -1,17 +1,102 @@
 # scripts/extract_text.py
 
+import re
 import fitz  # PyMuPDF
 
-def extract_text_from_pdf(pdf_path):
+SLIDE_MARKER = re.compile(r"^----- Slide (\d+) -----\n", re.MULTILINE)
+
+
+def format_slide(slide_number, text):
+    return f"----- Slide {slide_number} -----\n{text}\n"
+
+def extract_text_from_pdf(pdf_source):
     """
     Returns a single string with each slide labeled:
       "----- Slide 1 -----\n<slide 1 text>\n\n----- Slide 2 -----\n<slide 2 text>\n\n..."
+    `pdf_source` is either a path to a PDF file or the PDF's raw bytes.
     """
-    doc = fitz.open(pdf_path)
+    if isinstance(pdf_source, (bytes, bytearray, memoryview)):
+        doc = fitz.open(stream=pdf_source, filetype="pdf")
+    else:
+        doc = fitz.open(pdf_source)
     lines = []
     for page in doc:
         text = page.get_text().strip()
-        lines.append(f"----- Slide {page.number+1} -----\n{text}\n")
+        lines.append(format_slide(page.number + 1, text))
+    return "\n".join(lines)
+
+
+def split_slide_text(deck_text):
+    """
+    Inverse of extract_text_from_pdf: returns (slide_number, text) pairs in page order,
+    so callers that already hold the deck text need not reopen the PDF. The numbers are
+    the ones in the labels, so they stay correct after slides have been dropped.
+    """
+    parts = SLIDE_MARKER.split(deck_text)
+    return [(int(number), text.strip()) for number, text in zip(parts[1::2], parts[2::2])]
+
+
+def cap_slide_text(deck_text, max_slide_chars):
+    """
+    Cut each slide to at most `max_slide_chars` while keeping every slide label, so a few
+    text-heavy slides (appendix tables, footnotes) can't crowd the rest out of a prompt.
+    """
+    slides = split_slide_text(deck_text)
+    if not slides:
+        return deck_text
+    return "\n".join(format_slide(number, text[:max_slide_chars]) for number, text in slides)
+
+
+def fit_slide_text(deck_text, max_chars, keep_pattern=None):
+    """
+    Keep whole slides from the start (up to two thirds of `max_chars`) and the end of the
+    deck, dropping the middle once the deck is over budget. Slides whose text matches
+    `keep_pattern` are kept wherever they sit, as long as they fit. Each run of dropped
+    slides is replaced by an "...[N slides omitted]..." line, and the remaining labels
+    keep their original numbers.
+    """
+    if len(deck_text) <= max_chars:
+        return deck_text
+    slides = split_slide_text(deck_text)
+    if not slides:
+        return deck_text[:max_chars]
+    formatted = [format_slide(number, text) for number, text in slides]
+
+    kept, used = set(), 0
+    if keep_pattern is not None:
+        for i, (_, text) in enumerate(slides):
+            if keep_pattern.search(text) and used + len(formatted[i]) <= max_chars:
+                kept.add(i)
+                used += len(formatted[i])
+
+    head_budget = used + (max_chars - used) * 2 // 3
+    for i, slide in enumerate(formatted):
+        if i in kept:
+            continue
+        if used + len(slide) > head_budget:
+            break
+        kept.add(i)
+        used += len(slide)
+
+    for i in reversed(range(len(formatted))):
+        if i in kept:
+            continue
+        if used + len(formatted[i]) > max_chars:
+            break
+        kept.add(i)
+        used += len(formatted[i])
+
+    lines, omitted = [], 0
+    for i, slide in enumerate(formatted):
+        if i not in kept:
+            omitted += 1
+            continue
+        if omitted:
+            lines.append(f"...[{omitted} slides omitted]...\n")
+            omitted = 0
+        lines.append(slide)
+    if omitted:
+        lines.append(f"...[{omitted} slides omitted]...\n")
     return "\n".join(lines)
 
 
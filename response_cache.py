@@ -0,0 +1,81 @@
+# response_cache.py
+# ---------- ON-DISK CACHE FOR CHATGPT RESPONSES ----------
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+CACHE_FOLDER = ".gpt_cache"
+CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+
+def response_cache_key(model: str, prompt: str) -> str:
+    """
+    Key a response by the model and the exact prompt text it was given.
+    """
+    return hashlib.sha256(f"{model}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(CACHE_FOLDER, f"{key}.json")
+
+
+def load_cached_response(key: str):
+    """
+    Return the parsed response stored under `key`, or None if it is missing,
+    unreadable or older than CACHE_TTL_SECONDS. Expired entries are deleted.
+    """
+    path = _cache_path(key)
+    try:
+        if time.time() - os.path.getmtime(path) > CACHE_TTL_SECONDS:
+            os.remove(path)
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def store_cached_response(key: str, result) -> None:
+    """
+    Persist a parsed response. Written to a uniquely named temp file and renamed
+    into place so a concurrent reader never sees a half-written entry. Best-effort:
+    a failed write only means a later cache miss, never a failed call.
+    """
+    tmp_path = None
+    try:
+        os.makedirs(CACHE_FOLDER, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_FOLDER, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        os.replace(tmp_path, _cache_path(key))
+    except OSError:
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def prune_expired_responses() -> int:
+    """
+    Delete every entry older than CACHE_TTL_SECONDS, so entries whose prompt
+    never comes back don't pile up. Best-effort; returns how many were removed.
+    """
+    removed = 0
+    try:
+        names = os.listdir(CACHE_FOLDER)
+    except OSError:
+        return 0
+    cutoff = time.time() - CACHE_TTL_SECONDS
+    for name in names:
+        path = os.path.join(CACHE_FOLDER, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except OSError:
+            pass
+    return removed
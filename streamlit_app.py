@@ -9,15 +9,21 @@
 
 import streamlit as st
 import pandas as pd
-import os
-import json
+import re
+import asyncio
+import threading
+import orjson
+from functools import partial
 import fitz                                # PyMuPDF, for rendering PDF pages
 import hashlib
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 
-from extract_text import extract_text_from_pdf
-from analyze import (build_few_shot_prompt, call_chatgpt,build_insight_prompt, call_chatgpt_insight)
-from analyze_scoring import build_structured_scoring_prompt, call_structured_pitch_scorer
+from extract_text import extract_text_from_pdf, split_slide_text, cap_slide_text, fit_slide_text
+from analyze import (build_few_shot_prompt, call_chatgpt_async, build_insight_prompt, call_chatgpt_insight_async,
+                     KEY_SLIDE_FIELDS, coerce_page_number, RELEVANT_SLIDE_PATTERN)
+from analyze_scoring import (build_structured_scoring_prompt, call_structured_pitch_scorer_async,
+                             SECTION_SLIDE_PATTERN)
+from response_cache import response_cache_key, load_cached_response, store_cached_response, prune_expired_responses
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -33,6 +39,26 @@ st.set_page_config(
 # ─────────────────────────────────────────────────────────────────────────────
 openai_api_key = st.secrets["openai"]["api_key"]
 
+
+@st.cache_resource
+def get_openai_client() -> OpenAI:
+    """
+    One sync OpenAI client per server process, so its HTTP connection pool
+    (and the TLS sessions in it) is reused across calls, reruns and sessions.
+    """
+    return OpenAI(api_key=openai_api_key)
+
+
+@st.cache_resource
+def prune_response_cache() -> int:
+    """
+    Clear expired ChatGPT responses off disk once per server process.
+    """
+    return prune_expired_responses()
+
+
+prune_response_cache()
+
 # ─────────────────────────────────────────────────────────────────────────────
 # 3) HIDE DEPRECATION WARNINGS FOR use_column_width
 # ─────────────────────────────────────────────────────────────────────────────
@@ -44,95 +70,83 @@ HIDE_WARNING_STYLE = """
     }
 </style>
 """
-st.markdown(HIDE_WARNING_STYLE, unsafe_allow_html=True)
 
 # ─────────────────────────────────────────────────────────────────────────────
 # 4) CUSTOM CSS FOR A CLEANER LOOK
 # ─────────────────────────────────────────────────────────────────────────────
-def set_custom_styles():
-    custom_css = f"""
-    <style>
-    .stApp {{
-        background-size: cover;
-        background-position: center;
-        background-attachment: fixed;
-    }}
-    .block-container {{
-        background-color: rgba(255, 255, 255, 0.95);
-        border-radius: rem;
-        padding: 2rem;
-        box-shadow: 0 8px 30px rgba(0,0,0,0.);
-    }}
-    h {{
-        font-size: 28px !important;
-        font-weight: 700;
-    }}
-    .uploaded-filename, .processing-msg, .success-msg, .extracted-title {{
-        font-size: 14px;
-        font-weight: 500;
-        color: #222;
-        margin-top: -0.rem;
-        margin-bottom: 2.5rem;
-    }}
-    .stButton>button {{
-        border-radius: 8px;
-        padding: 0.5rem rem;
-        border: none;
-        background-color: #3A86FF;
-        color: white;
-        font-weight: 600;
-        transition: 0.3s ease;
-    }}
-    .stButton>button:hover {{
-        background-color: #265DAB;
-        transform: scale(.02);
-    }}
-    .narrow-uploader {{
-        max-width: 500px;
-        margin-left: auto;
-        margin-right: auto;
-    }}
-    div[data-testid="stFileUploader"] > div > div:nth-child(2),
-    div[data-testid="stFileUploader"] ul,
-    div[data-testid="stFileUploader"] li {{
-        display: none !important;
-    }}
-    .success-msg-container {{
-        font-size: 14px;
-        font-weight: 500;
-        color: #222;
-        margin-top: -0.5rem;
-        margin-bottom: rem;
-    }}
-    .extracted-title {{
-        font-size: 18px;
-        font-weight: 600;
-        margin-bottom: 0.8rem;
-    }}
-    </style>
-    """
-    st.markdown(custom_css, unsafe_allow_html=True)
-
-set_custom_styles()
-
-st.markdown("""
-    <style>
-    /* Narrow dropdowns in the main view (not sidebar) */
-    div[data-baseweb="select"] {
-        max-width: 500px !important;
-    }
-    </style>
-""", unsafe_allow_html=True)
-
-st.markdown("""
-    <style>
-    /* Reduce width of file uploader */
-    div[data-testid="stFileUploader"] {
-        max-width: 600px;
-        margin-left: 0;  /* optional: align left */
-    }
-    </style>
-""", unsafe_allow_html=True)
+# Plain constant: nothing in it varies between reruns. Streamlit drops any element
+# a rerun doesn't re-emit, so it is still injected on every run (as one element).
+CUSTOM_CSS = """
+<style>
+.stApp {
+    background-size: cover;
+    background-position: center;
+    background-attachment: fixed;
+}
+.block-container {
+    background-color: rgba(255, 255, 255, 0.95);
+    border-radius: rem;
+    padding: 2rem;
+    box-shadow: 0 8px 30px rgba(0,0,0,0.);
+}
+h {
+    font-size: 28px !important;
+    font-weight: 700;
+}
+.uploaded-filename, .processing-msg, .success-msg, .extracted-title {
+    font-size: 14px;
+    font-weight: 500;
+    color: #222;
+    margin-top: -0.rem;
+    margin-bottom: 2.5rem;
+}
+.stButton>button {
+    border-radius: 8px;
+    padding: 0.5rem rem;
+    border: none;
+    background-color: #3A86FF;
+    color: white;
+    font-weight: 600;
+    transition: 0.3s ease;
+}
+.stButton>button:hover {
+    background-color: #265DAB;
+    transform: scale(.02);
+}
+.narrow-uploader {
+    max-width: 500px;
+    margin-left: auto;
+    margin-right: auto;
+}
+div[data-testid="stFileUploader"] > div > div:nth-child(2),
+div[data-testid="stFileUploader"] ul,
+div[data-testid="stFileUploader"] li {
+    display: none !important;
+}
+.success-msg-container {
+    font-size: 14px;
+    font-weight: 500;
+    color: #222;
+    margin-top: -0.5rem;
+    margin-bottom: rem;
+}
+.extracted-title {
+    font-size: 18px;
+    font-weight: 600;
+    margin-bottom: 0.8rem;
+}
+/* Narrow dropdowns in the main view (not sidebar) */
+div[data-baseweb="select"] {
+    max-width: 500px !important;
+}
+/* Reduce width of file uploader */
+div[data-testid="stFileUploader"] {
+    max-width: 600px;
+    margin-left: 0;  /* optional: align left */
+}
+</style>
+"""
+st.markdown(HIDE_WARNING_STYLE + CUSTOM_CSS, unsafe_allow_html=True)
 
 
 
@@ -152,60 +166,382 @@ tab1, tab2, tab3 = st.tabs(["Library View", "Dashboard", "AI Insights"])
 
 
 # ─────────────────────────────────────────────────────────────────────────────
-# 7) HELPER: ASK CHATGPT TO PICK KEY SLIDE PAGE NUMBERS
+# 7) HELPER: FIND KEY SLIDE PAGE NUMBERS (KEYWORDS FIRST, CHATGPT AS FALLBACK)
+#    (for pages the extraction call left null)
 # ─────────────────────────────────────────────────────────────────────────────
-def identify_key_slide_pages(page_texts: list[str], api_key: str) -> dict:
+# PyMuPDF is not thread-safe: only one thread (upload worker or script thread
+# rendering a preview, in any session) may use it at a time.
+PDF_PARSE_LOCK = threading.Lock()
+
+# Only the start of each page is sent to ChatGPT, so don't keep more than this.
+PAGE_SCAN_CHARS = 300
+
+# Previews are rendered to a fixed pixel width, whatever the page size
+# (85/72 dpi on a standard 10-inch slide). Long decks get the smaller width.
+LONG_DECK_PAGES = 60
+PREVIEW_WIDTH_PX = 850
+LONG_DECK_PREVIEW_WIDTH_PX = 720
+PREVIEW_JPEG_QUALITY = 75
+
+# Decks longer than this only have their first and last pages scanned.
+SCAN_ALL_PAGES_UP_TO = 40
+SCAN_HEAD_PAGES = 25
+SCAN_TAIL_PAGES = 10
+
+# The slide's section is almost always named in its first line.
+SLIDE_TITLE_CHARS = 60
+
+# Slide headings usually name the section outright. A hit in the first
+# TITLE_CHARS of a page counts TITLE_WEIGHT times.
+KEY_SLIDE_PATTERNS = {
+    "TeamPage": re.compile(r"\b(?:team|founders?|co-?founders?|leadership)\b", re.IGNORECASE),
+    "MarketPage": re.compile(r"\b(?:(?i:market(?: size| opportunity)?)|TAM|SAM|SOM)\b"),
+    "TractionPage": re.compile(r"\b(?:traction|growth|kpis?|revenues?|mrr|arr|users)\b", re.IGNORECASE),
+}
+TITLE_CHARS = 100
+TITLE_WEIGHT = 3
+
+def guess_key_slide_pages(page_texts: list[str]) -> dict:
+    """
+    Pick the Team, Market and Traction pages by keyword hits, without a model call.
+    Same shape as identify_key_slide_pages; a category no page mentions is None.
+    """
+    key_info = {}
+    for field, pattern in KEY_SLIDE_PATTERNS.items():
+        best_page, best_score = None, 0
+        for i, text in enumerate(page_texts):
+            score = len(pattern.findall(text)) + (TITLE_WEIGHT - 1) * len(pattern.findall(text[:TITLE_CHARS]))
+            if score > best_score:
+                best_page, best_score = i + 1, score
+        key_info[field] = best_page
+    return key_info
+
+
+def slide_title(page_text: str) -> str:
+    """
+    First non-empty line of a page's text, capped at SLIDE_TITLE_CHARS.
+    """
+    return page_text.strip().split("\n", 1)[0].strip()[:SLIDE_TITLE_CHARS]
+
+
+def identify_key_slide_pages(page_texts: list[str], client: OpenAI) -> dict:
     """
     Given a list of page texts (0-indexed), ask ChatGPT which page numbers
     correspond to the Team, Market, and Traction slides. Returns a dict:
       { "TeamPage": <int or null>, "MarketPage": <int or null>, "TractionPage": <int or null> }
     Page numbers are 1-indexed. If ChatGPT cannot find a category, it returns null.
     """
-    prompt_lines = [
-        "I will give you text snippets from each slide of a pitch deck, one snippet per page. "
+    # Long decks: the key slides sit in the body, not the appendix, so send the
+    # first and last pages only (numbers keep their original position).
+    page_numbers = range(1, len(page_texts) + 1)
+    if len(page_texts) > SCAN_ALL_PAGES_UP_TO:
+        page_numbers = [*page_numbers[:SCAN_HEAD_PAGES], *page_numbers[-SCAN_TAIL_PAGES:]]
+
+    # Send just each page's title line to keep the prompt concise.
+    snippets = "".join(
+        f"---\nPage {n}:\n{slide_title(page_texts[n-1])}\n\n"
+        for n in page_numbers
+    )
+
+    final_prompt = (
+        "I will give you the title line of each slide of a pitch deck, one per page. "
         "Identify EXACTLY which page number (1-indexed) is the Team slide, "
         "which page number is the Market slide, and which page number is the Traction slide. "
         "If you cannot find one of those categories, return null. "
-        "Answer in JSON format with keys \"TeamPage\", \"MarketPage\", \"TractionPage\".\n"
-    ]
-
-    for i, full_text in enumerate(page_texts):
-        # Use just the first 200 characters as a “snippet” to keep the prompt concise.
-        snippet = full_text.replace("\n", " ").strip()[:200]
-        prompt_lines.append(f"---\nPage {i+1}:\n{snippet}\n")
-
-    prompt_lines.append(
-        "\nRespond exactly like:\n"
+        "Answer in JSON format with keys \"TeamPage\", \"MarketPage\", \"TractionPage\".\n\n"
+        + snippets
+        + "\nRespond exactly like:\n"
         "{\n"
         '  "TeamPage": 7,\n'
         '  "MarketPage": 5,\n'
         '  "TractionPage": 15\n'
         "}\n"
     )
+    model = "gpt-3.5-turbo"
+    cache_key = response_cache_key(model, final_prompt)
+    answer = load_cached_response(cache_key)
+    if answer is None:
+        response = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": final_prompt}],
+            temperature=0.0,
+            max_tokens=80,  # the three-key answer is ~30 tokens
+            response_format={"type": "json_object"},
+        )
+        content = response.choices[0].message.content
 
-    final_prompt = "\n".join(prompt_lines)
-    client = OpenAI(api_key=api_key)
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[{"role": "user", "content": final_prompt}],
-        temperature=0.0,
-        max_tokens=200,
-    )
-    content = response.choices[0].message.content.strip()
-
-    try:
-        return json.loads(content)
-    except json.JSONDecodeError:
-        # Fallback: find the `{…}` block and parse it
-        start = content.find("{")
-        end = content.rfind("}") + 1
-        if start != -1 and end != -1:
+        try:
+            # JSON mode guarantees a single object, so no need to hunt for the `{…}` block
+            answer = orjson.loads(content)
+            store_cached_response(cache_key, answer)
+        except orjson.JSONDecodeError:
+            # Only a truncated reply gets here; treat it as "nothing found" (not cached)
+            answer = {}
+    return {field: coerce_page_number(answer.get(field)) for field in KEY_SLIDE_FIELDS}
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def render_slide_preview(pdf_hash: str, page_index: int, width_px: int, _pdf_bytes: bytes) -> bytes:
+    """
+    Render one page of a deck as a JPEG `width_px` wide. Cached on (pdf_hash, page_index, width_px);
+    the PDF bytes are left out of the cache key since pdf_hash already identifies them.
+    """
+    with PDF_PARSE_LOCK:
+        doc = fitz.open(stream=_pdf_bytes, filetype="pdf")
+        try:
+            page = doc.load_page(page_index)
+            zoom = width_px / page.rect.width
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+            return pix.tobytes("jpeg", jpg_quality=PREVIEW_JPEG_QUALITY)
+        finally:
+            doc.close()
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 7b) HELPERS: CACHED EXPORT PAYLOADS (ONLY REBUILT WHEN THE DATA CHANGES)
+# ─────────────────────────────────────────────────────────────────────────────
+# Exports are only built on click; keep just the latest few payloads in memory.
+@st.cache_data(show_spinner=False, max_entries=4)
+def to_json_bytes(results: list[dict]) -> bytes:
+    return orjson.dumps(results, option=orjson.OPT_INDENT_2)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode("utf-8")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 7c) HELPERS: ANALYZE NEW DECKS CONCURRENTLY
+# ─────────────────────────────────────────────────────────────────────────────
+# Upper bound on decks in flight at once, to stay inside OpenAI rate limits.
+MAX_CONCURRENT_DECKS = 20
+
+# Per-slide cap on the text sent to the model. A real slide rarely needs more;
+# longer ones are appendix tables or footnotes that only inflate the prompt.
+PROMPT_SLIDE_CHARS = 1200
+
+# Whole-deck budget (~10k tokens): leaves room for the instructions and the
+# reply inside gpt-3.5-turbo's 16k context even on very long decks.
+PROMPT_DECK_CHARS = 40000
+
+
+def get_pdf_hash(pdf_bytes: bytes) -> str:
+    return hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=128)
+def cached_extract_text(pdf_hash: str, _pdf_bytes: bytes) -> str:
+    """
+    Slide text for a PDF, cached on its get_pdf_hash digest so each unique deck is parsed
+    once across reruns and sessions (e.g. when a failed deck is retried).
+    """
+    with PDF_PARSE_LOCK:
+        return extract_text_from_pdf(_pdf_bytes)
+
+
+async def analyze_deck(filename: str, raw_bytes: bytes, pdf_hash: str, client: AsyncOpenAI,
+                       semaphore: asyncio.Semaphore) -> dict:
+    """
+    Extract the deck's text, then run extraction, scoring and red-flag
+    prompts concurrently. Returns the combined result dict.
+    """
+    async with semaphore:
+        # PyMuPDF is blocking, so keep it off the event loop
+        deck_text = await asyncio.to_thread(cached_extract_text, pdf_hash, raw_bytes)
+        capped_text = cap_slide_text(deck_text, PROMPT_SLIDE_CHARS)
+        # Over budget, only filler slides are dropped: extraction keeps the slides its
+        # fields come from, scoring and red flags keep every rubric-section slide
+        extraction_text = fit_slide_text(capped_text, PROMPT_DECK_CHARS, keep_pattern=RELEVANT_SLIDE_PATTERN)
+        review_text = fit_slide_text(capped_text, PROMPT_DECK_CHARS, keep_pattern=SECTION_SLIDE_PATTERN)
+
+        result, scoring_result, insight_result = await asyncio.gather(
+            call_chatgpt_async(build_few_shot_prompt(extraction_text), client=client),
+            call_structured_pitch_scorer_async(build_structured_scoring_prompt(review_text), client=client),
+            call_chatgpt_insight_async(build_insight_prompt(review_text), client=client),
+        )
+
+    result["__filename"] = filename
+    result["__truncated"] = extraction_text != capped_text or review_text != capped_text
+    result["Section Scores"] = scoring_result.get("sections", [])
+    result["Pitch Score"] = scoring_result.get("total_score", None)
+    result["Red Flags"] = insight_result.get("Red Flags", [])
+    return result
+
+
+async def analyze_decks(decks: list[tuple[str, bytes, str]], api_key: str, on_done=None) -> list:
+    """
+    Analyze (filename, bytes, pdf_hash) triples concurrently over one shared AsyncOpenAI
+    client. Returns results in input order; a failed deck yields its exception.
+    on_done(filename, result) is called as each deck finishes (result is None on failure).
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_DECKS)
+    async with AsyncOpenAI(api_key=api_key) as client:
+
+        async def run_one(filename, raw_bytes, pdf_hash):
+            result = None
             try:
-                return json.loads(content[start:end])
-            except:
-                pass
-        # If parsing fails, return all nulls
-        return {"TeamPage": None, "MarketPage": None, "TractionPage": None}
+                result = await analyze_deck(filename, raw_bytes, pdf_hash, client, semaphore)
+                return result
+            finally:
+                if on_done:
+                    on_done(filename, result)
+
+        return await asyncio.gather(
+            *(run_one(filename, raw_bytes, pdf_hash) for filename, raw_bytes, pdf_hash in decks),
+            return_exceptions=True,
+        )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 7d) HELPER: FLATTEN RESULTS INTO A DATAFRAME
+# ─────────────────────────────────────────────────────────────────────────────
+LIBRARY_COLUMNS = [
+    "Filename", "Startup Name", "Founding Year", "Founders", "Industry", "Niche", "USP",
+    "Funding Stage", "Current Revenue", "Amount Raised", "Pitch Score", "TAM", "SAM", "SOM",
+]
+
+DASHBOARD_COLUMNS = ["Filename", "Startup Name", "Founding Year", "Industry", "Funding Stage", "Pitch Score"]
+
+
+def join_founders(founders) -> str:
+    if isinstance(founders, list):
+        return "; ".join(founders)
+    return founders if isinstance(founders, str) else ""
+
+
+def build_results_df(results: list[dict]) -> pd.DataFrame:
+    """
+    Flatten the result dicts into the Library table with one pd.json_normalize
+    pass (Market.TAM → TAM, …) instead of building it row by row.
+    """
+    df = pd.json_normalize(results)
+    df = df.rename(columns={
+        "__filename": "Filename",
+        "Market.TAM": "TAM",
+        "Market.SAM": "SAM",
+        "Market.SOM": "SOM",
+    })
+    df = df.reindex(columns=LIBRARY_COLUMNS)
+    df["Founders"] = df["Founders"].map(join_founders)
+    return df
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 7e) HELPER: DASHBOARD FILTERS & CHART DATA (MEMOIZED PER FILTER SELECTION)
+# ─────────────────────────────────────────────────────────────────────────────
+@st.cache_data(show_spinner=False, max_entries=32)
+def filter_dashboard(df2: pd.DataFrame, industries: tuple, stages: tuple, year_range: tuple) -> dict:
+    """
+    Apply the sidebar filters and compute every chart series in one go. Reruns
+    that leave the data and the filter selection unchanged hit the cache.
+    """
+    mask = pd.Series(True, index=df2.index)
+    mask &= (df2["Industry"].isin(industries) | df2["Industry"].isna())
+    mask &= (df2["Funding Stage"].isin(stages) | df2["Funding Stage"].isna())
+
+    if year_range[0] is not None and year_range[1] is not None:
+        yr_min, yr_max = year_range
+        mask &= (
+            df2["Founding Year"].between(yr_min, yr_max)
+            | df2["Founding Year"].isna()
+        )
+
+    filtered = df2[mask]
+    return {
+        "filtered": filtered,
+        "industry_counts": filtered["Industry"].cat.remove_unused_categories().value_counts(),
+        "year_counts": (
+            filtered["Founding Year"]
+            .dropna()
+            .astype(int)
+            .value_counts()
+            .sort_index()
+        ),
+        "stage_counts": filtered["Funding Stage"].cat.remove_unused_categories().value_counts(),
+        "pitch_score_counts": filtered["Pitch Score"].dropna().value_counts().sort_index(),
+    }
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 7f) KEY SLIDE PREVIEW (A FRAGMENT, SO PICKING A DECK ONLY RERUNS THIS BLOCK)
+# ─────────────────────────────────────────────────────────────────────────────
+@st.fragment
+def show_key_slide_preview(deck_names: list[str], all_results: list[dict], pdf_buffers: dict) -> None:
+    """
+    Show the Team, Market and Traction slides of the deck picked in the selectbox.
+    """
+    st.markdown("##### Key Slide Preview")
+    st.markdown("Select a deck from the table above to preview its important slides (Team, Market, Traction).")
+
+    selected_deck = st.selectbox(
+        "❓ Which Deck would you like to preview?",
+        options=deck_names
+    )
+
+    if selected_deck:
+        try:
+            pdf_bytes = pdf_buffers[selected_deck]
+            pdf_hash = get_pdf_hash(pdf_bytes)
+            selected_rec = next(
+                (rec for rec in all_results if rec.get("__filename") == selected_deck), {}
+            )
+            # Parsed at upload and cached by file hash; no need to reopen the PDF
+            deck_text = cached_extract_text(pdf_hash, pdf_bytes)
+            slide_texts = split_slide_text(deck_text)
+            page_count = len(slide_texts)
+
+            # Returned by the extraction call, already coerced to int or None
+            key_info = {field: selected_rec.get(field) for field in KEY_SLIDE_FIELDS}
+            if None in key_info.values():
+                # Fill the gaps from keywords, then ChatGPT for whatever is still missing
+                fallback = st.session_state.key_slides_cache.get(pdf_hash)
+                if fallback is None:
+                    page_texts = [text[:PAGE_SCAN_CHARS] for _, text in slide_texts]
+                    fallback = guess_key_slide_pages(page_texts)
+                    if any(key_info[field] is None and fallback[field] is None for field in KEY_SLIDE_FIELDS):
+                        llm_info = identify_key_slide_pages(page_texts, client=get_openai_client())
+                        fallback = {field: fallback[field] or llm_info[field] for field in KEY_SLIDE_FIELDS}
+                    st.session_state.key_slides_cache[pdf_hash] = fallback
+                key_info = {field: key_info[field] or fallback[field] for field in KEY_SLIDE_FIELDS}
+
+            team_idx = (key_info["TeamPage"] - 1) if key_info["TeamPage"] else None
+            market_idx = (key_info["MarketPage"] - 1) if key_info["MarketPage"] else None
+            traction_idx = (key_info["TractionPage"] - 1) if key_info["TractionPage"] else None
+
+            key_slides = []
+            if isinstance(team_idx, int) and 0 <= team_idx < page_count:
+                key_slides.append((f"Team Slide (page {team_idx+1})", team_idx))
+            if isinstance(market_idx, int) and 0 <= market_idx < page_count:
+                key_slides.append((f"Market Slide (page {market_idx+1})", market_idx))
+            if isinstance(traction_idx, int) and 0 <= traction_idx < page_count:
+                key_slides.append((f"Traction Slide (page {traction_idx+1})", traction_idx))
+
+            if not key_slides:
+                st.warning("⚠️ ChatGPT did not locate Team/Market/Traction slides in this deck.")
+            else:
+                width_px = LONG_DECK_PREVIEW_WIDTH_PX if page_count > LONG_DECK_PAGES else PREVIEW_WIDTH_PX
+                cols = st.columns(len(key_slides))
+                for col, (label, page_index) in zip(cols, key_slides):
+                    img_bytes = render_slide_preview(pdf_hash, page_index, width_px, pdf_bytes)
+                    col.image(img_bytes, caption=label, use_container_width=True)
+        except KeyError:
+            st.error(f"❌ Unable to preview **{selected_deck}**: PDF data not found. Try re-uploading the file.")
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# 7g) HELPER: COLOUR SECTION SCORES (ONE CALL PER COLUMN, NOT PER CELL)
+# ─────────────────────────────────────────────────────────────────────────────
+def color_scores(scores: pd.Series) -> pd.Series:
+    """
+    CSS for each score: green (8+), orange (5-7), red (below 5); blank if not a number.
+    """
+    numeric = pd.to_numeric(scores, errors="coerce")
+    styles = pd.Series("", index=scores.index)
+    styles[numeric < 5] = "color: red;"
+    styles[numeric >= 5] = "color: orange;"
+    styles[numeric >= 8] = "color: green; font-weight: bold;"
+    return styles
 
 
 # ─────────────────────────────────────────────────────────────────────────────
@@ -232,66 +568,75 @@ with tab1:
     if "pdf_bytes_cache" not in st.session_state:
         st.session_state.pdf_bytes_cache = {}  # Persist PDF bytes across reruns
 
+    if "key_slides_cache" not in st.session_state:
+        st.session_state.key_slides_cache = {}  # Key slide pages by PDF hash
+
     all_results = st.session_state.all_results
     pdf_buffers = {}
 
-    def get_pdf_hash(pdf_bytes: bytes) -> str:
-        return hashlib.sha256(pdf_bytes).hexdigest()
-
     if uploaded_files:
-        with st.spinner("🔎 Analyzing pitch decks..."):
-            # Filter for new files only
-            new_files = [pdf_file for pdf_file in uploaded_files 
-                         if pdf_file.name not in st.session_state.processed_filenames]
-
-            for pdf_file in new_files:
-                raw_bytes = pdf_file.read()
-                pdf_hash = get_pdf_hash(raw_bytes)
-                if pdf_hash in st.session_state.insights_cache:
-                    # Skip if already cached to avoid duplicate processing
-                    if pdf_file.name not in st.session_state.processed_filenames:
-                        all_results.append(st.session_state.insights_cache[pdf_hash])
+        # Filter for new files only
+        new_files = [pdf_file for pdf_file in uploaded_files 
+                     if pdf_file.name not in st.session_state.processed_filenames]
+
+        if new_files:
+            # One status box updated in place instead of a line per file
+            with st.status("🔎 Analyzing pitch decks...", expanded=True) as status:
+                pending = []  # (filename, raw_bytes, pdf_hash) still to analyze
+                pending_hashes = set()
+                duplicates = []  # same content as a deck already pending under another name
+                for pdf_file in new_files:
+                    raw_bytes = pdf_file.read()
+                    pdf_hash = get_pdf_hash(raw_bytes)
+                    if pdf_hash in pending_hashes:
+                        duplicates.append((pdf_file.name, raw_bytes, pdf_hash))
+                        continue
+                    if pdf_hash in st.session_state.insights_cache:
+                        # Skip if already cached to avoid duplicate processing
+                        all_results.append({**st.session_state.insights_cache[pdf_hash], "__filename": pdf_file.name})
                         st.session_state.pdf_bytes_cache[pdf_file.name] = raw_bytes
                         st.session_state.processed_filenames.add(pdf_file.name)
-                    continue
-
-                temp_folder = "temp"
-                os.makedirs(temp_folder, exist_ok=True)
-                temp_path = os.path.join(temp_folder, pdf_file.name)
-                with open(temp_path, "wb") as f:
-                    f.write(raw_bytes)
-
-                try:
-                    # Extract all text from PDF
-                    deck_text = extract_text_from_pdf(temp_path)
-                    
-                    # Build the result dict
-                    prompt = build_few_shot_prompt(deck_text)
-                    result = call_chatgpt(prompt, api_key=openai_api_key)
-                    result["FullText"] = deck_text
-                    result["__filename"] = pdf_file.name
-
-                    # Generate Structured Scores
-                    scoring_prompt = build_structured_scoring_prompt(deck_text)
-                    scoring_result = call_structured_pitch_scorer(scoring_prompt, api_key=openai_api_key)
-                    result["Section Scores"] = scoring_result.get("sections", [])
-                    result["Pitch Score"] = scoring_result.get("total_score", None)
-                    
-                    # Generate AI Insights (only Red Flags)
-                    insight_prompt = build_insight_prompt(deck_text)
-                    insight_result = call_chatgpt_insight(insight_prompt, api_key=openai_api_key)
-                    result["Red Flags"] = insight_result.get("Red Flags", [])
-                    
-                    # Store results in cache and session state
-                    st.session_state.insights_cache[pdf_hash] = result
-                    all_results.append(result)
-                    st.session_state.pdf_bytes_cache[pdf_file.name] = raw_bytes
-                    st.session_state.processed_filenames.add(pdf_file.name)
-                    os.remove(temp_path)
-
-                except Exception as e:
-                    st.error(f"❌ Error processing **{pdf_file.name}**: {e}")
-                    continue
+                        continue
+                    pending.append((pdf_file.name, raw_bytes, pdf_hash))
+                    pending_hashes.add(pdf_hash)
+
+                if pending:
+                    done = []
+                    finished = []  # results so far, shown before the slowest deck is back
+                    finished_table = st.empty()
+
+                    def report_progress(filename, result):
+                        done.append(filename)
+                        status.update(label=f"🔎 Analyzed {filename} ({len(done)}/{len(pending)})...")
+                        if result is not None:
+                            finished.append(result)
+                            finished_table.dataframe(build_results_df(finished), use_container_width=True)
+
+                    outcomes = asyncio.run(analyze_decks(
+                        pending,
+                        api_key=openai_api_key,
+                        on_done=report_progress,
+                    ))
+
+                    for (filename, raw_bytes, pdf_hash), outcome in zip(pending, outcomes):
+                        if isinstance(outcome, Exception):
+                            st.error(f"❌ Error processing **{filename}**: {outcome}")
+                            continue
+
+                        # Store results in cache and session state
+                        st.session_state.insights_cache[pdf_hash] = outcome
+                        all_results.append(outcome)
+                        st.session_state.pdf_bytes_cache[filename] = raw_bytes
+                        st.session_state.processed_filenames.add(filename)
+
+                    # Duplicate uploads reuse the result of their first copy, under their own name
+                    for filename, raw_bytes, pdf_hash in duplicates:
+                        if pdf_hash in st.session_state.insights_cache:
+                            all_results.append({**st.session_state.insights_cache[pdf_hash], "__filename": filename})
+                            st.session_state.pdf_bytes_cache[filename] = raw_bytes
+                            st.session_state.processed_filenames.add(filename)
+
+                status.update(label="✅ Pitch decks analyzed", state="complete", expanded=False)
 
         # Populate pdf_buffers for all results
         for rec in all_results:
@@ -308,41 +653,21 @@ with tab1:
                 """,
                 unsafe_allow_html=True,
             )
+            truncated = [rec.get("__filename") for rec in all_results if rec.get("__truncated")]
+            if truncated:
+                st.warning(
+                    "⚠️ Some slides were left out of the analysis because these decks are very long: "
+                    + ", ".join(truncated)
+                )
             st.markdown("---")
             
-            # Build DataFrame
-            rows = []
-            for rec in all_results:
-                startup_name = rec.get("StartupName") or rec.get("Startup Name")
-                founding_year = rec.get("FoundingYear") or rec.get("Founding Year")
-                founders = rec.get("Founders") or []
-                industry = rec.get("Industry")
-                niche = rec.get("Niche")
-                usp = rec.get("USP")
-                funding_stage = rec.get("FundingStage") or rec.get("Funding Stage")
-                current_rev = rec.get("CurrentRevenue") or rec.get("Current Revenue")
-                amount_raised = rec.get("AmountRaised") or rec.get("Amount Raised")
-
-                row = {
-                    "Filename": rec.get("__filename"),
-                    "Startup Name": startup_name,
-                    "Founding Year": founding_year,
-                    "Founders": "; ".join(founders),
-                    "Industry": industry,
-                    "Niche": niche,
-                    "USP": usp,
-                    "Funding Stage": funding_stage,
-                    "Current Revenue": current_rev,
-                    "Amount Raised": amount_raised,
-                    "Pitch Score": rec.get("Pitch Score", "N/A")
-                }
-                market = rec.get("Market") or {}
-                row["TAM"] = market.get("TAM")
-                row["SAM"] = market.get("SAM")
-                row["SOM"] = market.get("SOM")
-                rows.append(row)
-
-            df = pd.DataFrame(rows)
+            # Build DataFrame only when the set of results changed, so reruns
+            # triggered from the Dashboard sliders reuse the previous table
+            results_key = tuple(id(rec) for rec in all_results)
+            if st.session_state.get("results_df_key") != results_key:
+                st.session_state.results_df = build_results_df(all_results)
+                st.session_state.results_df_key = results_key
+            df = st.session_state.results_df
             st.markdown('<div class="extracted-title">Library</div>', unsafe_allow_html=True)
 
             # Filtering options
@@ -354,29 +679,33 @@ with tab1:
             )
             
             if startups_to_remove:
-                df = df[~df["Startup Name"].isin(startups_to_remove)]
+                remove_set = frozenset(startups_to_remove)
+                df = df.loc[~df["Startup Name"].isin(remove_set)]
                 all_results = [
                     rec for rec in all_results
-                    if (rec.get("StartupName") or rec.get("Startup Name")) not in startups_to_remove
+                    if rec.get("Startup Name") not in remove_set
                 ]
                 st.session_state.all_results = all_results
                 # Update pdf_bytes_cache to remove deleted files
+                kept_filenames = {rec.get("__filename") for rec in all_results}
                 st.session_state.pdf_bytes_cache = {
                     k: v for k, v in st.session_state.pdf_bytes_cache.items()
-                    if k in [rec.get("__filename") for rec in all_results]
+                    if k in kept_filenames
                 }
 
+            # Dashboard reuses this table instead of rebuilding it from all_results
+            st.session_state.library_df = df
             st.dataframe(df, use_container_width=True)
 
-            # Export buttons
-            json_str = json.dumps(all_results, indent=2)
-            csv_bytes = df.to_csv(index=False).encode("utf-8")
+            # Export buttons (payloads are only built when a button is clicked)
+            json_bytes = partial(to_json_bytes, all_results)
+            csv_bytes = partial(to_csv_bytes, df)
 
             col1, col2, _ = st.columns([1, 1, 6])
             with col1:
                 st.download_button(
                     label="Export JSON ➜",
-                    data=json_str,
+                    data=json_bytes,
                     file_name="All_decks.json",
                     mime="application/json",
                 )
@@ -390,47 +719,8 @@ with tab1:
 
             st.markdown("---")
 
-            # Key Slide Preview
-            st.markdown("##### Key Slide Preview")
-            st.markdown("Select a deck from the table above to preview its important slides (Team, Market, Traction).")
-
-            selected_deck = st.selectbox(
-                "❓ Which Deck would you like to preview?",
-                options=df["Filename"].tolist()
-            )
-
-            if selected_deck:
-                try:
-                    pdf_bytes = pdf_buffers[selected_deck]
-                    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-                    page_texts = [page.get_text() for page in doc]
-                    key_info = identify_key_slide_pages(page_texts, api_key=openai_api_key)
-                    
-                    team_idx = (int(key_info["TeamPage"]) - 1) if key_info.get("TeamPage") else None
-                    market_idx = (int(key_info["MarketPage"]) - 1) if key_info.get("MarketPage") else None
-                    traction_idx = (int(key_info["TractionPage"]) - 1) if key_info.get("TractionPage") else None
-
-                    key_slides = []
-                    if isinstance(team_idx, int) and 0 <= team_idx < doc.page_count:
-                        key_slides.append((f"Team Slide (page {team_idx+1})", team_idx))
-                    if isinstance(market_idx, int) and 0 <= market_idx < doc.page_count:
-                        key_slides.append((f"Market Slide (page {market_idx+1})", market_idx))
-                    if isinstance(traction_idx, int) and 0 <= traction_idx < doc.page_count:
-                        key_slides.append((f"Traction Slide (page {traction_idx+1})", traction_idx))
-
-                    if not key_slides:
-                        st.warning("⚠️ ChatGPT did not locate Team/Market/Traction slides in this deck.")
-                    else:
-                        cols = st.columns(len(key_slides))
-                        for col, (label, page_index) in zip(cols, key_slides):
-                            page = doc[page_index]
-                            pix = page.get_pixmap(dpi=100)
-                            img_bytes = pix.tobytes("png")
-                            col.image(img_bytes, caption=label, use_container_width=True)
-
-                    doc.close()
-                except KeyError:
-                    st.error(f"❌ Unable to preview **{selected_deck}**: PDF data not found. Try re-uploading the file.")
+            # Key Slide Preview (reruns on its own when another deck is selected)
+            show_key_slide_preview(df["Filename"].tolist(), all_results, pdf_buffers)
                     
 # ─────────────────────────────────────────────────────────────────────────────
 # 9) TAB 2: DASHBOARD & INTERACTIVE FILTERING
@@ -441,47 +731,38 @@ with tab2:
     if not all_results:
         st.warning("Upload at least one PDF in the Library View first, then come here to see the Dashboard.")
     else:
-        # Reconstruct DataFrame for filtering & charts
-        rows2 = []
-        for rec in all_results:
-            startup_name = rec.get("StartupName") or rec.get("Startup Name")
-            fy_raw = rec.get("FoundingYear") or rec.get("Founding Year")
-            try:
-                founding_year = int(fy_raw)
-            except:
-                founding_year = None
-
-            industry = rec.get("Industry")
-            funding_stage = rec.get("FundingStage") or rec.get("Funding Stage")
-            pitch_score = rec.get("Pitch Score")
-
-            rows2.append({
-                "Filename": rec["__filename"],
-                "Startup Name": startup_name,
-                "Founding Year": founding_year,
-                "Industry": industry,
-                "Funding Stage": funding_stage,
-                "Pitch Score": pitch_score
-            })
-
-        df2 = pd.DataFrame(rows2)
+        # Reuse the Library table for filtering & charts
+        library_df = st.session_state.get("library_df")
+        if library_df is None:
+            library_df = build_results_df(all_results)
+        df2 = library_df[DASHBOARD_COLUMNS].copy()
+        # Categoricals make isin/value_counts work on integer codes
+        df2["Industry"] = df2["Industry"].astype("category")
+        df2["Funding Stage"] = df2["Funding Stage"].astype("category")
+        # Years come from model output; anything implausible (e.g. 99999) becomes NA
+        df2["Founding Year"] = (
+            pd.to_numeric(df2["Founding Year"], errors="coerce")
+            .where(lambda years: years.between(1800, 2100))
+            .round()
+            .astype("Int16")
+        )
 
         # Sidebar Filters
         st.sidebar.header("🔎 Filters")
-        all_industries = sorted([i for i in df2["Industry"].unique() if pd.notna(i)])
+        all_industries = df2["Industry"].cat.categories.tolist()
         sel_industries = st.sidebar.multiselect(
             "Industry",
             options=all_industries,
             default=all_industries
         )
 
-        years_list = df2["Founding Year"].dropna().astype(int).tolist()
-        if len(years_list) == 0:
+        founding_years = df2["Founding Year"]
+        if not founding_years.notna().any():
             st.sidebar.info("No numeric founding‐year data available.")
             sel_year_range = (None, None)
         else:
-            min_year = min(years_list)
-            max_year = max(years_list)
+            min_year = int(founding_years.min())
+            max_year = int(founding_years.max())
             if min_year == max_year:
                 st.sidebar.write(f"Founded in: {min_year}")
                 sel_year_range = (min_year, max_year)
@@ -493,7 +774,7 @@ with tab2:
                     value=(min_year, max_year)
                 )
 
-        all_stages = sorted([s for s in df2["Funding Stage"].unique() if pd.notna(s)])
+        all_stages = df2["Funding Stage"].cat.categories.tolist()
         sel_stages = st.sidebar.multiselect(
             "Funding Stage",
             options=all_stages,
@@ -501,47 +782,24 @@ with tab2:
         )
 
         # Apply Filters
-        mask = pd.Series(True, index=df2.index)
-        mask &= (df2["Industry"].isin(sel_industries) | df2["Industry"].isna())
-        mask &= (df2["Funding Stage"].isin(sel_stages) | df2["Funding Stage"].isna())
-
-        if sel_year_range[0] is not None and sel_year_range[1] is not None:
-            yr_min, yr_max = sel_year_range
-            mask &= (
-                df2["Founding Year"].between(yr_min, yr_max)
-                | df2["Founding Year"].isna()
-            )
-
-        filtered = df2[mask]
+        summary = filter_dashboard(df2, tuple(sel_industries), tuple(sel_stages), tuple(sel_year_range))
+        filtered = summary["filtered"]
         st.markdown(f"###### 🔍 {filtered.shape[0]} startups match your filters")
 
         # Summary Charts
         if not filtered.empty:
             st.markdown("**Industry Breakdown**")
-            industry_counts = filtered["Industry"].value_counts(dropna=True)
-            st.bar_chart(industry_counts)
+            st.bar_chart(summary["industry_counts"])
 
             st.markdown("**Founding Year Distribution**")
-            year_counts = (
-                filtered["Founding Year"]
-                .dropna()
-                .astype(int)
-                .value_counts()
-                .sort_index()
-            )
-            st.bar_chart(year_counts)
+            st.bar_chart(summary["year_counts"])
 
             st.markdown("**Funding Stage Breakdown**")
-            stage_counts = filtered["Funding Stage"].value_counts(dropna=True)
-            st.bar_chart(stage_counts)
+            st.bar_chart(summary["stage_counts"])
 
             st.markdown("**Pitch Score Distribution**")
-            if "Pitch Score" in filtered.columns:
-                pitch_scores = filtered["Pitch Score"].dropna()
-                if not pitch_scores.empty:
-                    st.bar_chart(pitch_scores.value_counts().sort_index())
-                else:
-                    st.info("No pitch score data available")
+            if not summary["pitch_score_counts"].empty:
+                st.bar_chart(summary["pitch_score_counts"])
             else:
                 st.info("No pitch score data available")
 
@@ -618,17 +876,7 @@ with tab3:
                     for sec in section_scores
                 ])
 
-                def color_score(val):
-                    if isinstance(val, (int, float)):
-                        if val >= 8:
-                            return 'color: green; font-weight: bold;'
-                        elif val >= 5:
-                            return 'color: orange;'
-                        else:
-                            return 'color: red;'
-                    return ''
-
-                styled_table = section_table.style.applymap(color_score, subset=['Score (out of 10)'])
+                styled_table = section_table.style.apply(color_scores, subset=['Score (out of 10)'])
 
                 st.dataframe(styled_table, use_container_width=True)
 
@@ -0,0 +1,68 @@
+# test_slide_text.py
+# ---------- REGRESSION CHECKS FOR SLIDE-LABEL HANDLING ----------
+
+import re
+
+from extract_text import format_slide, split_slide_text, cap_slide_text, fit_slide_text
+from analyze import select_relevant_slides
+from analyze_scoring import SECTION_SLIDE_PATTERN
+
+SLIDE_LABEL = re.compile(r"^----- Slide (\d+) -----$", re.MULTILINE)
+
+
+def make_deck(slide_texts):
+    return "\n".join(format_slide(i + 1, text) for i, text in enumerate(slide_texts))
+
+
+def test_split_slide_text_keeps_label_numbers():
+    deck = "\n".join([format_slide(1, "Cover"), format_slide(7, "Our Team"), format_slide(12, "Ask")])
+    assert split_slide_text(deck) == [(1, "Cover"), (7, "Our Team"), (12, "Ask")]
+
+
+def test_cap_fit_select_keep_original_labels_on_long_deck():
+    """
+    60-slide deck over budget whose Team slide is slide 50: after the per-slide cap,
+    the whole-deck budget and the relevant-slide selection, it must still be "Slide 50".
+    """
+    slide_texts = [f"Filler slide {n}\n" + "x" * 400 for n in range(1, 61)]
+    slide_texts[49] = "Our Team\nAlice (CEO), Bob (CTO)"
+    deck = make_deck(slide_texts)
+
+    fitted = fit_slide_text(cap_slide_text(deck, 1200), 16000)
+    assert len(fitted) < len(deck)  # middle slides were dropped
+
+    selected = select_relevant_slides(fitted)
+    team_labels = [
+        number for number, text in split_slide_text(selected) if text.startswith("Our Team")
+    ]
+    assert team_labels == [50]
+
+    # Every label left in the prompt is an original slide number, in order
+    labels = [int(n) for n in SLIDE_LABEL.findall(selected)]
+    assert labels == sorted(labels)
+    assert set(labels) <= set(range(1, 61))
+
+
+def test_fit_keeps_section_slides_and_marks_the_gap():
+    """
+    A competition slide in the middle of an over-budget deck is kept for scoring, and
+    each run of dropped slides is replaced by an explicit "slides omitted" line.
+    """
+    slide_texts = [f"Filler slide {n}\n" + "x" * 400 for n in range(1, 61)]
+    slide_texts[29] = "Competition\nIncumbents are slow"
+    deck = make_deck(slide_texts)
+
+    fitted = fit_slide_text(cap_slide_text(deck, 1200), 16000, keep_pattern=SECTION_SLIDE_PATTERN)
+    assert "----- Slide 30 -----\nCompetition\nIncumbents are slow\n" in fitted
+
+    omitted = [int(n) for n in re.findall(r"^\.\.\.\[(\d+) slides omitted\]\.\.\.$", fitted, re.MULTILINE)]
+    labels = [int(n) for n in SLIDE_LABEL.findall(fitted)]
+    assert len(omitted) == 2
+    assert sum(omitted) + len(labels) == 60
+
+
+if __name__ == "__main__":
+    test_split_slide_text_keeps_label_numbers()
+    test_cap_fit_select_keep_original_labels_on_long_deck()
+    test_fit_keeps_section_slides_and_marks_the_gap()
+    print("OK")